@@ -0,0 +1,321 @@
+"""
+Offline bulk scanning and redaction of JSONL corpora.
+
+Each input line is an `InputGuardrailRequest` or an `OutputGuardrailRequest`
+(a record with a `responseBody` is treated as output). The selected guardrails
+run over the records in a process pool; every worker loads its models once and
+the NSFW classifier runs batched over all choices in a chunk of lines. Results
+are streamed to the output JSONL in input order, one line per input record:
+
+    {"line": 12, "results": {"nsfw-filtering": {"status": "blocked", "detail": "..."}}}
+
+where status is one of "passed", "transformed" (with the transformed "body"),
+"blocked" (the guardrail raised a 4xx HTTPException) or "error".
+
+A checkpoint file next to the output records how many input lines have been
+written, so an interrupted run can continue with --resume.
+
+Example:
+    python bulk_scan.py chats.jsonl redacted.jsonl -g pii-redaction -g nsfw-filtering \\
+        --config '{"transform_input": true}' --workers 8
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import get_context
+from typing import Iterator, Optional
+
+from runtime_config import affinity_cpus, apply_runtime_config, effective_cpu_count
+
+# Guardrail name -> (module, function, request kind it applies to), in the order they run.
+# PII detection runs before redaction so that, with its "presidio" detection backend, both share
+# one Presidio analysis of the original text.
+GUARDRAILS = {
+    "pii-detection": ("guardrail.pii_detection_guardrails_ai", "pii_detection_guardrails_ai", "input"),
+    "pii-redaction": ("guardrail.pii_redaction_presidio", "process_input_guardrail", "input"),
+    "web-sanitization": ("guardrail.web_sanitization_guardrails_ai", "web_sanitization", "input"),
+    "nsfw-filtering": ("guardrail.nsfw_filtering_local_eval", "nsfw_filtering", "output"),
+    "drug-mention": ("guardrail.drug_mention_guardrails_ai", "drug_mention", "output"),
+}
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Per-worker state, populated by _init_worker
+_worker_guardrails: dict = {}
+_worker_config: dict = {}
+_worker_inference_batch_size = 8
+
+
+def _init_worker(
+    guardrail_names: list[str],
+    default_config: dict,
+    threads: int,
+    inference_batch_size: int,
+    pin_cpus: bool,
+    worker_counter,
+) -> None:
+    global _worker_config, _worker_inference_batch_size
+
+    # Give each worker its share of the usable CPUs, before any model library is imported.
+    # Without --pin-cpus workers are never pinned, not even with CPU_PINNING=true, which
+    # would put every worker on the same first cores
+    cpus = []
+    if pin_cpus:
+        with worker_counter.get_lock():
+            index = worker_counter.value
+            worker_counter.value += 1
+        allowed = affinity_cpus()
+        cpus = [allowed[(index * threads + i) % len(allowed)] for i in range(threads)]
+    apply_runtime_config(cpu_budget=threads, pin_cpus=cpus)
+
+    from inference_runtime import runtime
+
+    _worker_config = default_config
+    _worker_inference_batch_size = inference_batch_size
+    for name in sorted(guardrail_names, key=list(GUARDRAILS).index):
+        module_name, function_name, kind = GUARDRAILS[name]
+        module = importlib.import_module(module_name)
+        _worker_guardrails[name] = (getattr(module, function_name), kind)
+
+    # Load models once per worker rather than on the first record
+    if "nsfw-filtering" in _worker_guardrails:
+        from guardrail.nsfw_filtering_local_eval import RUNTIME_MODEL
+        runtime.get_model(RUNTIME_MODEL)
+    if "pii-redaction" in _worker_guardrails or "pii-detection" in _worker_guardrails:
+        from presidio_entities import preload_presidio
+        preload_presidio()
+
+
+def _parse_record(raw: str):
+    from entities import InputGuardrailRequest, OutputGuardrailRequest
+
+    record = json.loads(raw)
+    record["config"] = {**_worker_config, **(record.get("config") or {})}
+    if "responseBody" in record:
+        return OutputGuardrailRequest.model_validate(record), "output"
+    return InputGuardrailRequest.model_validate(record), "input"
+
+
+def _run_guardrail(function, request) -> dict:
+    from fastapi import HTTPException
+
+    try:
+        body = function(request)
+    except HTTPException as e:
+        status = "blocked" if e.status_code < 500 else "error"
+        return {"status": status, "detail": str(e.detail)}
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+    if body is None:
+        return {"status": "passed"}
+    return {"status": "transformed", "body": body}
+
+
+def _choice_contents(request) -> list[str]:
+    return [
+        choice["message"]["content"]
+        for choice in request.responseBody.get("choices", [])
+        if "content" in choice.get("message", {})
+    ]
+
+
+def _classify(texts: list[str]) -> list[list[dict]]:
+    from guardrail.nsfw_filtering_local_eval import classify_texts
+    from inference_runtime import PRIORITY_BULK
+
+    return classify_texts(texts, batch_size=_worker_inference_batch_size, priority=PRIORITY_BULK)
+
+
+def _nsfw_verdict(classifications: list[list[dict]]) -> dict:
+    from guardrail.nsfw_filtering_local_eval import is_nsfw
+
+    if any(is_nsfw(classification) for classification in classifications):
+        return {"status": "blocked", "detail": "This message is not allowed as it is NSFW"}
+    return {"status": "passed"}
+
+
+def _nsfw_record(request) -> dict:
+    try:
+        return _nsfw_verdict(_classify(_choice_contents(request)))
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+
+
+def _nsfw_batch(requests: list) -> list[dict]:
+    """Runs the NSFW classifier over every choice of every request in one batched call."""
+    try:
+        contents = [_choice_contents(request) for request in requests]
+        classifications = _classify([text for texts in contents for text in texts])
+    except Exception:
+        # One malformed record must not turn the whole chunk into errors, so classify record by record
+        return [_nsfw_record(request) for request in requests]
+
+    results = []
+    offset = 0
+    for texts in contents:
+        results.append(_nsfw_verdict(classifications[offset:offset + len(texts)]))
+        offset += len(texts)
+    return results
+
+
+def process_batch(lines: list[tuple[int, str]]) -> list[dict]:
+    """Applies the worker's guardrails to a chunk of (line number, raw JSON) pairs."""
+    outputs = []
+    parsed = []
+    for line_number, raw in lines:
+        output = {"line": line_number, "results": {}}
+        outputs.append(output)
+        try:
+            parsed.append((output, *_parse_record(raw)))
+        except Exception as e:
+            output["error"] = f"Invalid record: {e}"
+
+    for name, (function, kind) in _worker_guardrails.items():
+        applicable = [(output, request) for output, request, request_kind in parsed if request_kind == kind]
+        if name == "nsfw-filtering":
+            verdicts = _nsfw_batch([request for _, request in applicable])
+        else:
+            verdicts = [_run_guardrail(function, request) for _, request in applicable]
+        for (output, _), verdict in zip(applicable, verdicts):
+            output["results"][name] = verdict
+    return outputs
+
+
+def _read_checkpoint(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_checkpoint(path: str, lines_done: int, output_offset: int) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"lines_done": lines_done, "output_offset": output_offset}, f)
+    os.replace(tmp_path, path)
+
+
+def _read_batches(input_file, start_line: int, batch_size: int) -> Iterator[list[tuple[int, str]]]:
+    numbered = (
+        (line_number, line)
+        for line_number, line in enumerate(input_file, start=1)
+        if line_number > start_line and line.strip()
+    )
+    while batch := list(islice(numbered, batch_size)):
+        yield batch
+
+
+def run(
+    input_path: str,
+    output_path: str,
+    guardrail_names: list[str],
+    default_config: Optional[dict] = None,
+    workers: Optional[int] = None,
+    batch_size: int = 64,
+    inference_batch_size: int = 8,
+    resume: bool = False,
+    pin_cpus: bool = False,
+) -> int:
+    """
+    Scans `input_path` with the given guardrails and streams results to `output_path`.
+
+    Returns:
+        Number of records processed in this run
+
+    Raises:
+        ValueError: If resuming from a checkpoint that is ahead of the output file
+    """
+    checkpoint_path = f"{output_path}.checkpoint"
+    start_line = 0
+    if resume and os.path.exists(checkpoint_path):
+        checkpoint = _read_checkpoint(checkpoint_path)
+        output_size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+        if checkpoint["output_offset"] > output_size:
+            # Truncating would pad the output with null bytes rather than restore the missing results
+            raise ValueError(
+                f"Checkpoint {checkpoint_path} expects {checkpoint['output_offset']} bytes of output, "
+                f"but {output_path} has {output_size}; rerun without --resume"
+            )
+        start_line = checkpoint["lines_done"]
+        # Drop anything written after the last checkpoint
+        with open(output_path, "a") as f:
+            f.truncate(checkpoint["output_offset"])
+        logger.info(f"Resuming after line {start_line}")
+    else:
+        # A stale checkpoint from an earlier run would make a later --resume skip lines
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        if os.path.exists(output_path):
+            open(output_path, "w").close()
+
+    usable_cpus = effective_cpu_count()
+    workers = workers or usable_cpus
+    threads = max(1, usable_cpus // workers)
+    context = get_context("spawn")
+    processed = 0
+    with (
+        open(input_path) as input_file,
+        open(output_path, "a") as output_file,
+        ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(guardrail_names, default_config or {}, threads, inference_batch_size, pin_cpus, context.Value("i", 0)),
+        ) as executor,
+    ):
+        pending = deque()
+        batches = _read_batches(input_file, start_line, batch_size)
+
+        def drain_one():
+            nonlocal processed
+            batch, future = pending.popleft()
+            for output in future.result():
+                output_file.write(json.dumps(output) + "\n")
+            output_file.flush()
+            processed += len(batch)
+            _write_checkpoint(checkpoint_path, batch[-1][0], output_file.tell())
+
+        # Bound the number of in-flight batches so large inputs are streamed, not buffered
+        for batch in batches:
+            pending.append((batch, executor.submit(process_batch, batch)))
+            if len(pending) >= workers * 2:
+                drain_one()
+        while pending:
+            drain_one()
+
+    logger.info(f"Processed {processed} records into {output_path}")
+    return processed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run guardrails over a JSONL corpus of guardrail requests")
+    parser.add_argument("input", help="Input JSONL of InputGuardrailRequest/OutputGuardrailRequest records")
+    parser.add_argument("output", help="Output JSONL of per-record guardrail results")
+    parser.add_argument(
+        "-g", "--guardrail", action="append", required=True, choices=sorted(GUARDRAILS),
+        help="Guardrail to apply (repeatable)",
+    )
+    parser.add_argument("--config", type=json.loads, default={}, help="JSON config applied to records without their own values")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: usable CPUs)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Records sent to a worker at a time")
+    parser.add_argument("--inference-batch-size", type=int, default=8, help="Texts per model forward pass")
+    parser.add_argument("--resume", action="store_true", help="Continue from the output's checkpoint")
+    parser.add_argument("--pin-cpus", action="store_true", help="Pin each worker to its own cores")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    run(
+        args.input,
+        args.output,
+        list(dict.fromkeys(args.guardrail)),
+        default_config=args.config,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        inference_batch_size=args.inference_batch_size,
+        resume=args.resume,
+        pin_cpus=args.pin_cpus,
+    )
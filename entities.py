@@ -1,5 +1,5 @@
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 
 class RequestContext(BaseModel):
@@ -71,3 +71,6 @@ class InputGuardrailRequest(BaseModel):
     context: RequestContext
     config: Optional[dict] = None
 
+    # Presidio analysis results shared by the guardrails handling this request
+    _analysis_cache: dict = PrivateAttr(default_factory=dict)
+
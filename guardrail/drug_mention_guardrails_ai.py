@@ -1,17 +1,39 @@
 from typing import Optional
 from fastapi import HTTPException
 from guardrails import Guard
+from guardrails.errors import ValidationError
 from guardrails.hub import MentionsDrugs
 
 from entities import OutputGuardrailRequest
+from verdict_cache import VerdictCache
 
 # Setup the Guard with the validator
 guard = Guard().use(MentionsDrugs, on_fail="exception")
 
+# Validation error (or None when valid) of previously checked texts. Exact matches only:
+# a near-duplicate can differ in exactly the drug name the validator looks for
+verdict_cache = VerdictCache("drug_mention", similarity=None)
+
+
+def _validate(content: str) -> Optional[str]:
+    # Only validation failures are cached; other errors propagate and are retried next time
+    try:
+        guard.validate(content)
+        return None
+    except ValidationError as e:
+        return str(e)
+
+
 def drug_mention(request: OutputGuardrailRequest) -> Optional[dict]:
     try:
-        for choice in request.responseBody.get("choices", []):
-            if "content" in choice.get("message", {}):
-                guard.validate(choice["message"]["content"])
+        contents = [
+            choice["message"]["content"]
+            for choice in request.responseBody.get("choices", [])
+            if "content" in choice.get("message", {})
+        ]
+        errors = verdict_cache.get_or_compute(contents, lambda misses: [_validate(content) for content in misses])
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    for error in errors:
+        if error is not None:
+            raise HTTPException(status_code=400, detail=error)
@@ -1,21 +1,65 @@
+from functools import lru_cache
 from typing import Optional
 
 from fastapi import HTTPException
 from entities import OutputGuardrailRequest
+from inference_runtime import PRIORITY_INTERACTIVE, runtime
+from snapshot import model_path
 from transformers import pipeline
+from verdict_cache import VerdictCache
+
+MODEL_NAME = "unitary/unbiased-toxic-roberta"
+RUNTIME_MODEL = "toxicity"
+
+# Labels that block a message once their score exceeds the threshold
+NSFW_THRESHOLDS = {
+    "toxicity": 0.2,
+    "sexual_explicit": 0.2,
+    "obscene": 0.2,
+}
+
+
+@lru_cache(maxsize=None)
+def get_classifier():
+    # Loaded from the warm-start snapshot when available, otherwise from the Hugging Face hub
+    return pipeline("text-classification", model=model_path("toxicity", MODEL_NAME))
+
+
+def _classify_batch(classifier, texts: list[str], batch_size: int = 8) -> list[list[dict]]:
+    # Texts beyond the model's 512-token limit are truncated rather than failing the batch
+    outputs = classifier(texts, batch_size=batch_size, truncation=True)
+    # The pipeline returns a bare dict per text when only the top label is requested
+    return [[output] if isinstance(output, dict) else output for output in outputs]
+
+
+runtime.register(RUNTIME_MODEL, get_classifier, _classify_batch)
+
+# Label scores of previously classified (or near-duplicate) texts; thresholds are applied on every lookup
+verdict_cache = VerdictCache("nsfw_filtering")
+
+
+def classify_texts(texts: list[str], batch_size: int = 8, priority: int = PRIORITY_INTERACTIVE) -> list[list[dict]]:
+    """Classifies several texts through the shared inference runtime, returning the label scores for each text."""
+    return verdict_cache.get_or_compute(
+        texts,
+        lambda misses: runtime.infer(RUNTIME_MODEL, misses, priority=priority, batch_size=batch_size),
+    )
+
+
+def is_nsfw(classification_results: list[dict]) -> bool:
+    return any(
+        result["label"] in NSFW_THRESHOLDS and result["score"] > NSFW_THRESHOLDS[result["label"]]
+        for result in classification_results
+    )
 
-classifier = pipeline("text-classification", model="unitary/unbiased-toxic-roberta")
 
 def nsfw_filtering(request: OutputGuardrailRequest) -> Optional[dict]:
     transformed_body = request.responseBody.copy()  # Use dict copy method
-    for choice in transformed_body.get("choices", []):
-        if "content" in choice.get("message", {}):
-            classification_results = classifier(choice["message"]["content"])
-            for result in classification_results:
-                if (
-                    (result['label'] == 'toxicity' and result['score'] > 0.2) or
-                    (result['label'] == 'sexual_explicit' and result['score'] > 0.2) or
-                    (result['label'] == 'obscene' and result['score'] > 0.2)
-                ):
-                    raise HTTPException(status_code=400, detail=f"This message is not allowed as it is NSFW")
-
+    contents = [
+        choice["message"]["content"]
+        for choice in transformed_body.get("choices", [])
+        if "content" in choice.get("message", {})
+    ]
+    for classification_results in classify_texts(contents):
+        if is_nsfw(classification_results):
+            raise HTTPException(status_code=400, detail=f"This message is not allowed as it is NSFW")
@@ -1,21 +1,57 @@
+from functools import lru_cache
 from typing import Optional
 from fastapi import HTTPException
 from guardrails import Guard
-from guardrails.hub import (
-    DetectPII
-)
 
 from entities import InputGuardrailRequest
+from presidio_entities import DEFAULT_LANGUAGE, DEFAULT_RECOGNIZERS, parse_recognizers, analyze_text
+
+# Entity types of DetectPII's "pii" preset, so the Presidio backend flags the same kinds of PII
+DETECT_PII_ENTITIES = [
+    "EMAIL_ADDRESS",
+    "PHONE_NUMBER",
+    "DOMAIN_NAME",
+    "IP_ADDRESS",
+    "DATE_TIME",
+    "LOCATION",
+    "PERSON",
+    "URL",
+]
+
+
+@lru_cache(maxsize=None)
+def get_guard() -> Guard:
+    # Setup the Guard with the validator; DetectPII builds its own Presidio analyzer,
+    # so it is only created when the "guardrails_ai" backend is used
+    from guardrails.hub import DetectPII
+    return Guard().use(DetectPII, on_fail="exception")
+
+
+def _detect_with_presidio(request: InputGuardrailRequest, content: str, config: dict) -> None:
+    # Uses the shared, preset-configured analyzers from presidio_entities, so the
+    # analysis is reused when PII redaction runs on the same request
+    recognizers = parse_recognizers(config.get("recognizers", DEFAULT_RECOGNIZERS))
+    language = config.get("language", DEFAULT_LANGUAGE)
+    pii_entities = config.get("pii_entities", DETECT_PII_ENTITIES)
+
+    results = analyze_text(request, content, recognizers, language)
+    entity_types = sorted({r.entity_type for r in results if not pii_entities or r.entity_type in pii_entities})
+    if entity_types:
+        raise ValueError(f"Validation failed for field with errors: PII detected: {', '.join(entity_types)}")
 
-# Setup the Guard with the validator
-guard = Guard().use(DetectPII, on_fail="exception")
 
 def pii_detection_guardrails_ai(request: InputGuardrailRequest) -> Optional[dict]:
+    config = request.config or {}
+    # "guardrails_ai" uses the hub DetectPII validator, "presidio" the shared Presidio analyzers
+    detection_backend = config.get("detection_backend", "guardrails_ai")
     try:
         messages = request.requestBody.get("messages", [])
         for message in messages:
             if isinstance(message, dict) and message.get("content"):
-                guard.validate(message["content"])
+                if detection_backend == "guardrails_ai":
+                    get_guard().validate(message["content"])
+                else:
+                    _detect_with_presidio(request, message["content"], config)
         return None
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -2,7 +2,11 @@ import logging
 from typing import Optional
 
 from entities import InputGuardrailRequest
-from presidio_entities import DEFAULT_LANGUAGE, DEFAULT_RECOGNIZERS, parse_recognizers, get_analyzer, anonymizer
+from presidio_entities import DEFAULT_LANGUAGE, DEFAULT_RECOGNIZERS, parse_recognizers, analyze_text, anonymizer
+from redaction import check_against_anonymizer, redact, to_operator_configs, validate_operators
+
+# "fast" uses the span-based redaction engine, "presidio" the AnonymizerEngine
+REDACTION_ENGINES = ("fast", "presidio")
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -19,14 +23,21 @@ def process_input_guardrail(request: InputGuardrailRequest) -> Optional[dict]:
     
     # Get language configuration
     language = request.config.get("language", DEFAULT_LANGUAGE)
+
+    redaction_engine = request.config.get("redaction_engine", "fast")
+    verify_redaction = request.config.get("verify_redaction", False)
         
     try:
+        if redaction_engine not in REDACTION_ENGINES:
+            raise ValueError(
+                f"Unsupported redaction engine '{redaction_engine}'. "
+                f"Supported engines: {', '.join(REDACTION_ENGINES)}"
+            )
+        operators = validate_operators(request.config.get("operators"))
+
         # Parse and get recognizers
         recognizers = parse_recognizers(recognizer_config)
         
-        # Create analyzer with specified recognizers
-        analyzer = get_analyzer(recognizers, language)
-        
         # Process messages
         messages = request.requestBody.get('messages', [])
         transformed = False
@@ -34,26 +45,38 @@ def process_input_guardrail(request: InputGuardrailRequest) -> Optional[dict]:
         
         for message in messages:
             if isinstance(message, dict) and message.get("content"):
-                # Analyze for PII
-                results = analyzer.analyze(text=message["content"], language=language)
+                # Analyze for PII, reusing results from other guardrails on this request
+                results = analyze_text(request, message["content"], recognizers, language)
                 
                 # Anonymize detected PII
-                anonymized_content = anonymizer.anonymize(
-                    text=message["content"], 
-                    analyzer_results=results
-                )
+                if redaction_engine == "presidio":
+                    anonymized = anonymizer.anonymize(
+                        text=message["content"], 
+                        analyzer_results=results,
+                        operators=to_operator_configs(operators),
+                    )
+                    redacted_text = anonymized.text
+                    message_transformed = redacted_text != message["content"]
+                    entity_types = [item.entity_type for item in sorted(anonymized.items, key=lambda item: item.start)]
+                else:
+                    redacted = redact(message["content"], results, operators)
+                    redacted_text = redacted.text
+                    message_transformed = redacted.transformed
+                    entity_types = redacted.entity_types
+                    if verify_redaction:
+                        check_against_anonymizer(message["content"], results, operators, anonymizer)
                 
                 # Track if any transformation occurred
-                if anonymized_content.text != message["content"]:
+                if message_transformed:
                     transformed = True
                     logger.info(
                         f"PII detected and redacted. "
-                        f"Entities found: {[r.entity_type for r in results]}"
+                        f"Entities redacted: {entity_types}"
                     )
                 
                 transformed_messages.append({
                     "role": message["role"],
-                    "content": anonymized_content.text
+                    "content": redacted_text
                 })
         
         # Return transformed body only if PII was actually redacted
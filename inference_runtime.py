@@ -0,0 +1,223 @@
+"""
+Shared in-process inference runtime for the model-backed guardrails.
+
+Without it, the toxicity pipeline and the transformer-based NER recognizers
+each run their own models from whichever threads call them, and torch sizes
+its thread pool independently for each concurrent caller. The runtime owns:
+
+- the torch intra-/inter-op thread settings, applied once before any model runs
+- a registry of named models, each loaded once on first use
+- a single priority queue served by one dispatcher thread, which groups queued
+  requests for the same model (and the same call arguments) into one batch
+
+Guardrails register a loader and a batch function for their model and submit
+work with `runtime.infer(name, inputs, **kwargs)`, which blocks until the
+batch containing the inputs has run and returns one output per input.
+"""
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, ContextManager, Optional
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "32"))
+# How long the dispatcher waits for more requests to join a batch
+MAX_BATCH_WAIT_MS = float(os.getenv("INFERENCE_MAX_BATCH_WAIT_MS", "2"))
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Observer set by `observe_batches` for work submitted from the current thread
+_submitter = threading.local()
+
+
+@contextmanager
+def observe_batches(observer: Callable[[], ContextManager]):
+    """
+    Runs every batch that includes work submitted from the current thread inside
+    `observer()` on the dispatcher thread, e.g. to profile a request's inference.
+    """
+    previous = getattr(_submitter, "observer", None)
+    _submitter.observer = observer
+    try:
+        yield
+    finally:
+        _submitter.observer = previous
+
+
+@dataclass
+class _ModelEntry:
+    loader: Callable[[], Any]
+    batch_fn: Callable[..., list]
+    model: Any = None
+
+
+@dataclass
+class _Task:
+    model_name: str
+    inputs: list
+    kwargs: dict
+    future: Future = field(default_factory=Future)
+    observer: Optional[Callable[[], ContextManager]] = field(default_factory=lambda: getattr(_submitter, "observer", None))
+
+    @property
+    def batch_key(self) -> tuple:
+        return (self.model_name, tuple(sorted(self.kwargs.items())))
+
+
+class InferenceRuntime:
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, max_batch_wait_ms: float = MAX_BATCH_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait = max_batch_wait_ms / 1000
+        self.threads: dict[str, Optional[int]] = {
+            "intra_op": int(os.environ["TORCH_NUM_THREADS"]) if "TORCH_NUM_THREADS" in os.environ else None,
+            "inter_op": int(os.environ["TORCH_NUM_INTEROP_THREADS"]) if "TORCH_NUM_INTEROP_THREADS" in os.environ else None,
+        }
+        self._models: dict[str, _ModelEntry] = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._threads_applied = False
+
+    def configure_threads(self, intra_op: Optional[int] = None, inter_op: Optional[int] = None) -> None:
+        """Sets the torch thread counts used for every model; takes effect before the first model runs."""
+        if intra_op is not None:
+            self.threads["intra_op"] = intra_op
+        if inter_op is not None:
+            self.threads["inter_op"] = inter_op
+        if self._threads_applied:
+            self._apply_threads()
+
+    def _apply_threads(self) -> None:
+        import torch
+
+        if self.threads["intra_op"]:
+            torch.set_num_threads(self.threads["intra_op"])
+        if self.threads["inter_op"]:
+            try:
+                torch.set_num_interop_threads(self.threads["inter_op"])
+            except RuntimeError as e:
+                # torch only allows this before inter-op parallel work has started
+                logger.warning(f"Could not set torch inter-op threads: {str(e)}")
+        self._threads_applied = True
+        logger.info(f"Torch threads: intra-op={torch.get_num_threads()}, inter-op={torch.get_num_interop_threads()}")
+
+    def register(self, name: str, loader: Callable[[], Any], batch_fn: Callable[..., list]) -> None:
+        """
+        Registers a model with the runtime.
+
+        Args:
+            name: Unique model name used when submitting work
+            loader: Returns the loaded model; called once, on first use
+            batch_fn: Called as batch_fn(model, inputs, **kwargs) and returns one output per input
+        """
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = _ModelEntry(loader=loader, batch_fn=batch_fn)
+
+    def get_model(self, name: str) -> Any:
+        """Returns a registered model, loading it if needed."""
+        with self._load_lock:
+            if name not in self._models:
+                raise ValueError(f"Model '{name}' is not registered with the inference runtime")
+            entry = self._models[name]
+            if not self._threads_applied:
+                self._apply_threads()
+            if entry.model is None:
+                logger.info(f"Loading model '{name}'")
+                entry.model = entry.loader()
+            return entry.model
+
+    def submit(self, name: str, inputs: list, priority: int = PRIORITY_INTERACTIVE, **kwargs) -> Future:
+        """Queues inputs for a model; the future resolves to one output per input."""
+        if name not in self._models:
+            raise ValueError(f"Model '{name}' is not registered with the inference runtime")
+        task = _Task(model_name=name, inputs=list(inputs), kwargs=kwargs)
+        if not task.inputs:
+            task.future.set_result([])
+            return task.future
+        self._ensure_dispatcher()
+        self._queue.put((priority, next(self._sequence), task))
+        return task.future
+
+    def infer(self, name: str, inputs: list, priority: int = PRIORITY_INTERACTIVE, **kwargs) -> list:
+        """Runs inputs through a model via the shared queue and waits for the outputs."""
+        return self.submit(name, inputs, priority, **kwargs).result()
+
+    def _ensure_dispatcher(self) -> None:
+        with self._lock:
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._dispatch, name="inference-runtime", daemon=True)
+                self._dispatcher.start()
+
+    def _next_batch(self) -> list[_Task]:
+        _, _, first = self._queue.get()
+        batch = [first]
+        size = len(first.inputs)
+        # The wait is bounded per batch, so a steady stream of other work cannot hold it back
+        deadline = time.monotonic() + self.max_batch_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            task = item[2]
+            if task.batch_key != first.batch_key or size + len(task.inputs) > self.max_batch_size:
+                # Left for the next batch with its original priority and order
+                self._queue.put(item)
+                break
+            batch.append(task)
+            size += len(task.inputs)
+        return batch
+
+    def _run_batch(self, batch: list[_Task]) -> list:
+        first = batch[0]
+        with ExitStack() as stack:
+            for observer in {task.observer for task in batch if task.observer is not None}:
+                stack.enter_context(observer())
+            model = self.get_model(first.model_name)
+            inputs = [value for task in batch for value in task.inputs]
+            return self._models[first.model_name].batch_fn(model, inputs, **first.kwargs)
+
+    def _dispatch(self) -> None:
+        while True:
+            batch = self._next_batch()
+            try:
+                outputs = self._run_batch(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0].future.set_exception(e)
+                    continue
+                # One bad input must not fail the requests it was batched with, so run each task alone
+                logger.warning(f"Batch of {len(batch)} tasks for '{batch[0].model_name}' failed, retrying each task: {str(e)}")
+                for task in batch:
+                    try:
+                        task_outputs = self._run_batch([task])
+                    except Exception as task_error:
+                        task.future.set_exception(task_error)
+                    else:
+                        task.future.set_result(task_outputs)
+                continue
+
+            offset = 0
+            for task in batch:
+                task.future.set_result(outputs[offset:offset + len(task.inputs)])
+                offset += len(task.inputs)
+
+
+# Singleton runtime shared by every guardrail in the process
+runtime = InferenceRuntime()
@@ -1,24 +1,62 @@
+from runtime_config import apply_runtime_config
+
+# Thread settings must be in place before torch, tokenizers and spaCy are imported
+RUNTIME_CONFIG = apply_runtime_config()
+
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
 from fastapi import FastAPI, HTTPException
 from guardrail.pii_redaction_presidio import process_input_guardrail
-from guardrail.nsfw_filtering_local_eval import nsfw_filtering
-from presidio_entities import preload_presidio
+from guardrail.nsfw_filtering_local_eval import RUNTIME_MODEL, nsfw_filtering
+from inference_runtime import runtime
+from presidio_entities import DEFAULT_LANGUAGE, get_nlp_engine, preload_presidio
+from profiling import profiled, router as profiling_router
+from snapshot import LOAD_TIMES, load_timer
+from verdict_cache import cache_stats
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Size the thread pool serving the synchronous guardrail endpoints to the usable CPUs
+    to_thread.current_default_thread_limiter().total_tokens = RUNTIME_CONFIG.executor_threads
+
+    # Load models before accepting traffic, from the warm-start snapshot when one is present
+    with load_timer("spacy"):
+        get_nlp_engine(DEFAULT_LANGUAGE)
+    with load_timer("presidio"):
+        preload_presidio()
+    with load_timer("toxicity_model"):
+        runtime.get_model(RUNTIME_MODEL)
+    yield
+
 
 # Create FastAPI app instance
 app = FastAPI(
     title="Guardrail Server",
     description="A FastAPI application for input and output guardrails",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 @app.get("/")
 async def health_check():
-    return {"message": "Guardrail Server is running", "version": "1.0.0"}
+    return {
+        "message": "Guardrail Server is running",
+        "version": "1.0.0",
+        "load_times": LOAD_TIMES,
+        "verdict_caches": cache_stats(),
+        "runtime": RUNTIME_CONFIG.as_dict(),
+    }
+
 
 
+app.add_api_route( "/pii-redaction", endpoint=profiled("/pii-redaction", process_input_guardrail), methods=["POST"])
 
-app.add_api_route( "/pii-redaction", endpoint=process_input_guardrail, methods=["POST"])
+app.add_api_route("/nsfw-filtering",endpoint=profiled("/nsfw-filtering", nsfw_filtering),methods=["POST"])
 
-app.add_api_route("/nsfw-filtering",endpoint=nsfw_filtering,methods=["POST"])
+# Admin-only CPU/memory profiling, enabled by setting PROFILING_ADMIN_TOKEN
+app.include_router(profiling_router)
 
 
 
@@ -35,5 +73,4 @@ async def global_exception_handler(request, exc):
 # Run the app using Uvicorn if this script is executed directly
 if __name__ == "__main__":
     import uvicorn
-    preload_presidio()
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -1,7 +1,9 @@
 from enum import Enum
+from functools import lru_cache, partial
 import logging
 import os
-from presidio_analyzer import AnalyzerEngine, EntityRecognizer, RecognizerRegistry
+from presidio_analyzer import AnalyzerEngine, EntityRecognizer, RecognizerRegistry, RecognizerResult
+from presidio_analyzer.nlp_engine import NlpEngine, SpacyNlpEngine
 from presidio_analyzer.predefined_recognizers import (
     # US Recognizers
     UsSsnRecognizer,
@@ -66,11 +68,19 @@ from presidio_analyzer.predefined_recognizers import (
 )
 from presidio_anonymizer import AnonymizerEngine
 
+from inference_runtime import runtime
+
 
 # Default configuration
 DEFAULT_RECOGNIZERS = "ALL"
 DEFAULT_LANGUAGE = "en"
 
+# spaCy pipelines backing the NLP engine, keyed by language code
+SPACY_MODELS = {"en": "en_core_web_lg"}
+
+# Maximum number of distinct (recognizers, language) analyzers kept in memory
+ANALYZER_CACHE_SIZE = int(os.getenv("ANALYZER_CACHE_SIZE", "32"))
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -128,7 +138,31 @@ def parse_recognizers(recognizer_config: str | list[str]) -> list[str]:
     return recognizers
 
 
+@lru_cache(maxsize=None)
+def get_nlp_engine(language: str = DEFAULT_LANGUAGE) -> NlpEngine:
+    """
+    Returns the shared spaCy NLP engine for a language, loading it once.
+    """
+    if language not in SPACY_MODELS:
+        raise ValueError(
+            f"No spaCy model configured for language '{language}'. "
+            f"Supported languages: {', '.join(sorted(SPACY_MODELS))}"
+        )
+
+    model_name = SPACY_MODELS[language]
+    nlp_engine = SpacyNlpEngine(models=[{"lang_code": language, "model_name": model_name}])
+    nlp_engine.load()
+    logger.info(f"Loaded spaCy pipeline for '{language}' from {model_name}")
+    return nlp_engine
+
+
 def get_analyzer(recognizers: list[str], language: str = "en") -> AnalyzerEngine:
+    # Analyzers are cached per recognizer set so regex patterns and the NLP engine are reused
+    return _build_analyzer(tuple(recognizers), language)
+
+
+@lru_cache(maxsize=ANALYZER_CACHE_SIZE)
+def _build_analyzer(recognizers: tuple[str, ...], language: str) -> AnalyzerEngine:
     filtered_registry = RecognizerRegistry()
     loaded_count = 0
     
@@ -148,7 +182,70 @@ def get_analyzer(recognizers: list[str], language: str = "en") -> AnalyzerEngine
     else:
         logger.info(f"Successfully loaded {loaded_count}/{len(recognizers)} recognizers")
     
-    return AnalyzerEngine(registry=filtered_registry, supported_languages=[language])
+    return AnalyzerEngine(
+        registry=filtered_registry,
+        nlp_engine=get_nlp_engine(language),
+        supported_languages=[language],
+    )
+
+
+def analyze_text(request, text: str, recognizers: list[str], language: str = DEFAULT_LANGUAGE) -> list[RecognizerResult]:
+    """
+    Analyzes text once per request for a given recognizer set and language.
+
+    Guardrails that look at the same message (e.g. PII detection and PII redaction)
+    reuse the results stored on the request instead of analyzing the text again.
+    """
+    key = (text, tuple(recognizers), language)
+    cache = request._analysis_cache
+    if key not in cache:
+        cache[key] = get_analyzer(recognizers, language).analyze(text=text, language=language)
+    return cache[key]
+
+
+def _load_gliner(model_name: str, **load_kwargs):
+    from gliner import GLiNER
+    return GLiNER.from_pretrained(model_name, **load_kwargs)
+
+
+def _predict_gliner_batch(model, texts: list[str], labels: tuple[str, ...], **kwargs) -> list[list[dict]]:
+    if hasattr(model, "batch_predict_entities"):
+        return model.batch_predict_entities(texts, list(labels), **kwargs)
+    return [model.predict_entities(text, list(labels), **kwargs) for text in texts]
+
+
+class _RuntimeGLiNER:
+    """Stands in for a GLiNER model, sending predictions to the shared inference runtime."""
+
+    def __init__(self, runtime_model: str):
+        self.runtime_model = runtime_model
+
+    def predict_entities(self, text: str, labels: list[str], **kwargs) -> list[dict]:
+        return runtime.infer(self.runtime_model, [text], labels=tuple(labels), **kwargs)[0]
+
+
+class SharedGLiNERRecognizer(GLiNERRecognizer):
+    """
+    GLiNERRecognizer whose model is loaded once and run by the shared inference runtime,
+    so every analyzer using it shares one model and one batching queue.
+    """
+
+    def load(self) -> None:
+        # Fail at construction, like GLiNERRecognizer, when gliner is not installed
+        from gliner import GLiNER  # noqa: F401
+
+        # Same arguments as GLiNERRecognizer.load passes to GLiNER.from_pretrained
+        load_kwargs = {
+            "map_location": self.map_location,
+            "load_onnx_model": self.load_onnx_model,
+            "onnx_model_file": self.onnx_model_file,
+            **self.model_kwargs,
+        }
+        # Recognizers loading the same model differently get their own runtime model
+        options = ",".join(f"{key}={value!r}" for key, value in sorted(load_kwargs.items()))
+        runtime_model = f"gliner/{self.model_name}[{options}]"
+        runtime.register(runtime_model, partial(_load_gliner, self.model_name, **load_kwargs), _predict_gliner_batch)
+        self.gliner = _RuntimeGLiNER(runtime_model)
 
 
 class PresidioRecognizerType(str, Enum):
@@ -536,7 +633,7 @@ class PresidioRecognizerType(str, Enum):
             case cls.STANZA._value_:
                 return StanzaRecognizer()
             case cls.GLINER._value_:
-                return GLiNERRecognizer()
+                return SharedGLiNERRecognizer()
             case cls.AZURE_AI_LANGUAGE._value_:
                 return AzureAILanguageRecognizer()
             case cls.AZURE_HEALTH_DEID._value_:
@@ -0,0 +1,386 @@
+"""
+On-demand CPU and memory profiling of the guardrail endpoints.
+
+All routes live under /admin/profiling and require the `X-Admin-Token` header
+to match the PROFILING_ADMIN_TOKEN environment variable; without that variable
+the routes are disabled. Guardrail endpoints are registered through `profiled`
+so they can be observed under real traffic:
+
+- CPU: `POST /admin/profiling/cpu` profiles the next N requests or S seconds of
+  one route. Each matching request runs under cProfile and its handling thread
+  is sampled for stacks. Model inference runs on the inference runtime's
+  dispatcher thread, so batches that include a profiled request's inputs are
+  profiled and sampled there as well; those batches may also carry inputs of
+  other requests batched with it. Results are downloadable as pstats
+  (`/cpu/{id}/pstats`) and as collapsed stacks for flamegraph tools
+  (`/cpu/{id}/collapsed`).
+- Memory: `POST /admin/profiling/memory/start` enables tracemalloc, snapshots
+  can then be taken and diffed, and every guardrail call records its net
+  allocation and peak traced memory. Peaks are process-wide, so they are
+  approximate when requests run concurrently.
+"""
+import cProfile
+import inspect
+import logging
+import marshal
+import os
+import pstats
+import secrets
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Callable, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse, Response
+from pydantic import BaseModel, Field
+
+from inference_runtime import observe_batches
+
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")
+
+# Upper bound on a CPU profiling session, also used when only a request count is given
+MAX_SESSION_SECONDS = 600
+# Finished CPU sessions and memory snapshots kept for download
+MAX_STORED_RESULTS = 5
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    if not PROFILING_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, PROFILING_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin/profiling", dependencies=[Depends(require_admin)])
+
+
+class CpuProfileRequest(BaseModel):
+    """
+    Attributes:
+        route (str): Route to profile, e.g. "/pii-redaction".
+        requests (int): Number of requests to profile.
+        seconds (float): How long to profile for; defaults to MAX_SESSION_SECONDS when only requests is set.
+        sample_interval_ms (float): Interval between stack samples for the collapsed-stack output.
+    """
+    route: str
+    requests: Optional[int] = Field(default=None, gt=0)
+    seconds: Optional[float] = Field(default=None, gt=0)
+    sample_interval_ms: float = Field(default=5.0, gt=0)
+
+
+class _CpuSession:
+    def __init__(self, config: CpuProfileRequest):
+        self.id = uuid.uuid4().hex[:12]
+        self.route = config.route
+        self.max_requests = config.requests
+        self.deadline = time.monotonic() + min(config.seconds or MAX_SESSION_SECONDS, MAX_SESSION_SECONDS)
+        self.sample_interval = config.sample_interval_ms / 1000
+        self.started_at = time.time()
+        self.request_count = 0
+        self.stats: Optional[pstats.Stats] = None
+        self.samples: Counter = Counter()
+        self.active_threads: set[int] = set()
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    def admit(self, route: str) -> bool:
+        """Counts a request towards the session if it should be profiled."""
+        with self.lock:
+            if self.done.is_set() or route != self.route or time.monotonic() > self.deadline:
+                return False
+            if self.max_requests is not None and self.request_count >= self.max_requests:
+                return False
+            self.request_count += 1
+            self.active_threads.add(threading.get_ident())
+            return True
+
+    def _add_profile(self, profile: Optional[cProfile.Profile]) -> None:
+        if profile is None:
+            return
+        if self.stats is None:
+            self.stats = pstats.Stats(profile)
+        else:
+            self.stats.add(profile)
+
+    def release(self, profile: Optional[cProfile.Profile]) -> None:
+        with self.lock:
+            self.active_threads.discard(threading.get_ident())
+            self._add_profile(profile)
+            if self.max_requests is not None and self.request_count >= self.max_requests and not self.active_threads:
+                self.done.set()
+
+    @contextmanager
+    def profile_batch(self):
+        """Profiles and samples an inference runtime batch that includes a profiled request's inputs."""
+        profile = _start_profile()
+        with self.lock:
+            self.active_threads.add(threading.get_ident())
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            with self.lock:
+                self.active_threads.discard(threading.get_ident())
+                self._add_profile(profile)
+
+    def sample(self) -> None:
+        """Samples the stacks of the profiled request and inference threads until the session ends."""
+        while not self.done.wait(self.sample_interval):
+            if time.monotonic() > self.deadline:
+                self.done.set()
+                break
+            with self.lock:
+                thread_ids = set(self.active_threads)
+            if not thread_ids:
+                continue
+            frames = sys._current_frames()
+            stacks = []
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                if stack:
+                    stacks.append(";".join(reversed(stack)))
+            with self.lock:
+                self.samples.update(stacks)
+
+    def summary(self, limit: int = 30) -> dict:
+        top_functions = []
+        with self.lock:
+            stats = dict(self.stats.stats) if self.stats is not None else {}
+            request_count = self.request_count
+            sample_count = sum(self.samples.values())
+        if stats:
+            for (filename, line, function), (_, calls, tottime, cumtime, _) in sorted(
+                stats.items(), key=lambda item: item[1][3], reverse=True
+            )[:limit]:
+                top_functions.append({
+                    "function": f"{filename}:{line}({function})",
+                    "calls": calls,
+                    "tottime": round(tottime, 6),
+                    "cumtime": round(cumtime, 6),
+                })
+        return {
+            "id": self.id,
+            "route": self.route,
+            "done": self.done.is_set(),
+            "requests_profiled": request_count,
+            "samples": sample_count,
+            "top_functions": top_functions,
+        }
+
+
+_cpu_sessions: OrderedDict[str, _CpuSession] = OrderedDict()
+_active_session: Optional[_CpuSession] = None
+_sessions_lock = threading.Lock()
+
+_memory_snapshots: OrderedDict[str, tracemalloc.Snapshot] = OrderedDict()
+_guardrail_memory: dict[str, dict] = {}
+_guardrail_files: dict[str, str] = {}
+# Routes registered through `profiled`, the only ones a CPU session can observe
+_profiled_routes: set[str] = set()
+_memory_lock = threading.Lock()
+
+
+def _store(results: OrderedDict, key: str, value) -> None:
+    results[key] = value
+    while len(results) > MAX_STORED_RESULTS:
+        results.popitem(last=False)
+
+
+def _start_profile() -> Optional[cProfile.Profile]:
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiler is active on this interpreter; rely on stack samples only
+        return None
+    return profile
+
+
+def profiled(route: str, endpoint: Callable) -> Callable:
+    """Wraps a guardrail endpoint so CPU sessions and memory tracing can observe it."""
+    guardrail = endpoint.__name__
+    _guardrail_files[guardrail] = inspect.getsourcefile(endpoint)
+    _profiled_routes.add(route)
+
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        session = _active_session
+        if session is not None and not session.admit(route):
+            session = None
+        tracing = tracemalloc.is_tracing()
+        if session is None and not tracing:
+            return endpoint(*args, **kwargs)
+
+        profile = _start_profile() if session is not None else None
+        if tracing:
+            start_bytes, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        try:
+            # Follow the request's inference onto the runtime's dispatcher thread
+            with observe_batches(session.profile_batch) if session is not None else nullcontext():
+                return endpoint(*args, **kwargs)
+        finally:
+            if profile is not None:
+                profile.disable()
+            if session is not None:
+                session.release(profile)
+            if tracing and tracemalloc.is_tracing():
+                _record_memory(guardrail, start_bytes, *tracemalloc.get_traced_memory())
+
+    return wrapper
+
+
+def _record_memory(guardrail: str, start_bytes: int, end_bytes: int, peak_bytes: int) -> None:
+    with _memory_lock:
+        entry = _guardrail_memory.setdefault(guardrail, {"calls": 0, "net_bytes": 0, "max_peak_bytes": 0})
+        entry["calls"] += 1
+        entry["net_bytes"] += end_bytes - start_bytes
+        entry["max_peak_bytes"] = max(entry["max_peak_bytes"], peak_bytes - start_bytes)
+
+
+def _get_cpu_session(session_id: str) -> _CpuSession:
+    if session_id not in _cpu_sessions:
+        raise HTTPException(status_code=404, detail=f"Unknown profiling session '{session_id}'")
+    return _cpu_sessions[session_id]
+
+
+@router.post("/cpu")
+def start_cpu_profile(config: CpuProfileRequest) -> dict:
+    global _active_session
+    if config.route not in _profiled_routes:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Route '{config.route}' is not profiled. Profiled routes: {', '.join(sorted(_profiled_routes))}",
+        )
+    with _sessions_lock:
+        if _active_session is not None and not _active_session.done.is_set():
+            raise HTTPException(status_code=409, detail=f"Session '{_active_session.id}' is already running")
+        session = _CpuSession(config)
+        _store(_cpu_sessions, session.id, session)
+        _active_session = session
+    threading.Thread(target=session.sample, name=f"profiler-{session.id}", daemon=True).start()
+    logger.info(f"Started CPU profiling session {session.id} for {config.route}")
+    return session.summary()
+
+
+@router.get("/cpu/{session_id}")
+def get_cpu_profile(session_id: str, limit: int = 30) -> dict:
+    return _get_cpu_session(session_id).summary(limit)
+
+
+@router.delete("/cpu/{session_id}")
+def stop_cpu_profile(session_id: str) -> dict:
+    session = _get_cpu_session(session_id)
+    session.done.set()
+    return session.summary()
+
+
+@router.get("/cpu/{session_id}/pstats")
+def download_pstats(session_id: str) -> Response:
+    session = _get_cpu_session(session_id)
+    if session.stats is None:
+        raise HTTPException(status_code=404, detail="No requests have been profiled yet")
+    with session.lock:
+        # Same format as pstats.Stats.dump_stats, loadable with pstats/snakeviz
+        content = marshal.dumps(session.stats.stats)
+    return Response(
+        content=content,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{session_id}.pstats"'},
+    )
+
+
+@router.get("/cpu/{session_id}/collapsed")
+def download_collapsed_stacks(session_id: str) -> PlainTextResponse:
+    session = _get_cpu_session(session_id)
+    with session.lock:
+        samples = session.samples.most_common()
+    lines = [f"{stack} {count}" for stack, count in samples]
+    return PlainTextResponse(
+        "\n".join(lines) + "\n",
+        headers={"Content-Disposition": f'attachment; filename="{session_id}.collapsed"'},
+    )
+
+
+def _top_statistics(statistics: list, limit: int) -> list[dict]:
+    return [
+        {
+            "location": str(stat.traceback[0]),
+            "size_bytes": stat.size,
+            "count": stat.count,
+            **({"size_diff_bytes": stat.size_diff, "count_diff": stat.count_diff} if hasattr(stat, "size_diff") else {}),
+        }
+        for stat in statistics[:limit]
+    ]
+
+
+def _guardrail_allocations(snapshot: tracemalloc.Snapshot) -> dict:
+    # Live blocks allocated anywhere below each guardrail's module
+    allocations = {}
+    for guardrail, filename in _guardrail_files.items():
+        traces = snapshot.filter_traces([tracemalloc.Filter(True, filename, all_frames=True)])
+        stats = traces.statistics("filename")
+        allocations[guardrail] = {
+            "count": sum(stat.count for stat in stats),
+            "size_bytes": sum(stat.size for stat in stats),
+        }
+    return allocations
+
+
+@router.post("/memory/start")
+def start_memory_tracing(frames: int = 25) -> dict:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    return {"tracing": True, "frames": tracemalloc.get_traceback_limit()}
+
+
+@router.post("/memory/stop")
+def stop_memory_tracing() -> dict:
+    tracemalloc.stop()
+    return {"tracing": False}
+
+
+@router.post("/memory/snapshots")
+def take_memory_snapshot(limit: int = 20) -> dict:
+    if not tracemalloc.is_tracing():
+        raise HTTPException(status_code=409, detail="Memory tracing is not running")
+    snapshot = tracemalloc.take_snapshot()
+    snapshot_id = uuid.uuid4().hex[:12]
+    _store(_memory_snapshots, snapshot_id, snapshot)
+    current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    return {
+        "id": snapshot_id,
+        "current_bytes": current_bytes,
+        "peak_bytes": peak_bytes,
+        "top_allocations": _top_statistics(snapshot.statistics("lineno"), limit),
+        "guardrail_allocations": _guardrail_allocations(snapshot),
+    }
+
+
+@router.get("/memory/diff")
+def diff_memory_snapshots(base: str, target: str, limit: int = 20) -> dict:
+    for snapshot_id in (base, target):
+        if snapshot_id not in _memory_snapshots:
+            raise HTTPException(status_code=404, detail=f"Unknown memory snapshot '{snapshot_id}'")
+    statistics = _memory_snapshots[target].compare_to(_memory_snapshots[base], "lineno")
+    return {"base": base, "target": target, "top_differences": _top_statistics(statistics, limit)}
+
+
+@router.get("/memory/guardrails")
+def get_guardrail_memory() -> dict:
+    with _memory_lock:
+        return {"tracing": tracemalloc.is_tracing(), "guardrails": {k: dict(v) for k, v in _guardrail_memory.items()}}
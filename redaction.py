@@ -0,0 +1,237 @@
+"""
+Span-based redaction for the common Presidio operators.
+
+`AnonymizerEngine.anonymize` resolves conflicts between analyzer results with
+pairwise comparisons, dispatches an operator object per entity and rebuilds the
+text once per replacement. For the replace/mask/hash operators the same output
+can be produced by resolving the sorted analyzer spans in a single pass and
+joining the untouched text with the operator outputs once.
+
+Operator configuration uses the same shape as Presidio's `OperatorConfig`,
+keyed by entity type with "DEFAULT" as the fallback, and is validated the same
+way:
+
+    {"DEFAULT": {"type": "replace"},
+     "PHONE_NUMBER": {"type": "mask", "masking_char": "*", "chars_to_mask": 4, "from_end": true},
+     "EMAIL_ADDRESS": {"type": "hash", "hash_type": "sha256"}}
+
+Like Presidio's hash operator, "hash" salts every entity with a random 32-byte
+salt unless a "salt" of at least 16 bytes is configured, so only a configured
+salt gives reproducible hashes.
+
+Overlapping spans are resolved as `anonymize` does with its defaults
+(MERGE_SIMILAR_OR_CONTAINED, merge_entities_with_spaces): overlapping spans of
+the same type are merged, identical spans keep the highest scoring result (the
+later one on equal scores), contained spans are dropped, same-type spans
+separated only by spaces are joined, and of two partially overlapping spans of
+different types the earlier one is cut off where the later one starts.
+"""
+import hashlib
+import logging
+import os
+import re
+from typing import NamedTuple, Optional
+
+from presidio_anonymizer import AnonymizerEngine
+from presidio_anonymizer.entities import OperatorConfig, RecognizerResult
+
+SUPPORTED_OPERATORS = ("replace", "mask", "hash")
+SUPPORTED_HASH_TYPES = ("sha256", "sha512")
+DEFAULT_OPERATOR = {"type": "replace"}
+MIN_SALT_BYTES = 16
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class RedactedText(NamedTuple):
+    text: str
+    transformed: bool
+    entity_types: list[str]
+
+
+def _check_parameter(entity_type: str, operator: dict, name: str, expected_type: type, required: bool) -> None:
+    value = operator.get(name)
+    if value is None:
+        if required:
+            raise ValueError(f"{operator.get('type', 'replace').capitalize()} operator for {entity_type} requires '{name}'")
+        return
+    # Falsy values are not type checked, as in Presidio's validators
+    if value and not isinstance(value, expected_type):
+        raise ValueError(
+            f"Invalid '{name}' for {entity_type}: expected {expected_type.__name__}, got {type(value).__name__}"
+        )
+
+
+def _salt_bytes(entity_type: str, salt) -> bytes:
+    salt = salt.encode() if isinstance(salt, str) else salt
+    if not salt:
+        raise ValueError(f"Hash salt for {entity_type} cannot be empty; omit it to use a random salt per entity")
+    if len(salt) < MIN_SALT_BYTES:
+        raise ValueError(f"Hash salt for {entity_type} must be at least {MIN_SALT_BYTES} bytes, got {len(salt)}")
+    return salt
+
+
+def validate_operators(operators: Optional[dict]) -> dict[str, dict]:
+    """
+    Normalizes an operator configuration keyed by entity type.
+
+    Raises:
+        ValueError: If an operator type is not supported or its parameters are invalid
+    """
+    operators = {"DEFAULT": DEFAULT_OPERATOR, **(operators or {})}
+    for entity_type, operator in operators.items():
+        operator_type = operator.get("type", "replace")
+        if operator_type not in SUPPORTED_OPERATORS:
+            raise ValueError(
+                f"Unsupported operator '{operator_type}' for {entity_type}. "
+                f"Supported operators: {', '.join(SUPPORTED_OPERATORS)}"
+            )
+        if operator_type == "replace":
+            _check_parameter(entity_type, operator, "new_value", str, required=False)
+        elif operator_type == "mask":
+            _check_parameter(entity_type, operator, "masking_char", str, required=True)
+            if len(operator["masking_char"]) > 1:
+                raise ValueError(f"Invalid 'masking_char' for {entity_type}: must be a single character")
+            _check_parameter(entity_type, operator, "chars_to_mask", int, required=True)
+            _check_parameter(entity_type, operator, "from_end", bool, required=True)
+        else:
+            if operator.get("hash_type", "sha256") not in SUPPORTED_HASH_TYPES:
+                raise ValueError(
+                    f"Unsupported hash type '{operator['hash_type']}' for {entity_type}. "
+                    f"Supported hash types: {', '.join(SUPPORTED_HASH_TYPES)}"
+                )
+            if "salt" in operator:
+                _salt_bytes(entity_type, operator["salt"])
+    return operators
+
+
+def _apply_operator(operator: dict, entity_type: str, original: str) -> str:
+    operator_type = operator.get("type", "replace")
+    if operator_type == "replace":
+        return operator.get("new_value") or f"<{entity_type}>"
+    if operator_type == "mask":
+        chars_to_mask = max(0, min(len(original), operator["chars_to_mask"]))
+        start = len(original) - chars_to_mask if operator["from_end"] else 0
+        return original[:start] + operator["masking_char"] * chars_to_mask + original[start + chars_to_mask:]
+    salt = _salt_bytes(entity_type, operator["salt"]) if "salt" in operator else os.urandom(32)
+    return hashlib.new(operator.get("hash_type", "sha256"), original.encode() + salt).hexdigest()
+
+
+def merge_spans(text: str, analyzer_results: list[RecognizerResult]) -> list[tuple[int, int, str]]:
+    """
+    Resolves overlapping analyzer results the way `AnonymizerEngine.anonymize` does.
+
+    Returns:
+        (start, end, entity_type) spans sorted by start; spans of different types may still
+        partially overlap
+    """
+    # [start, end, entity_type, score, order]; order is the position Presidio keeps the result at
+    spans = []
+    last_of_type = {}
+    for order, result in enumerate(sorted(analyzer_results, key=lambda r: (r.start, r.end))):
+        span = last_of_type.get(result.entity_type)
+        if span is not None and min(span[1], result.end) > max(span[0], result.start):
+            # Overlapping results of the same type are merged into the later one
+            span[:] = [span[0], max(span[1], result.end), span[2], max(span[3], result.score), order]
+        else:
+            span = [result.start, result.end, result.entity_type, result.score, order]
+            spans.append(span)
+            last_of_type[result.entity_type] = span
+
+    # Identical spans keep the highest score, and the later result on equal scores
+    unique = {}
+    for span in sorted(spans, key=lambda s: s[4]):
+        best = unique.get((span[0], span[1]))
+        if best is None or span[3] >= best[3]:
+            unique[(span[0], span[1])] = span
+
+    # Spans contained in another span are dropped
+    resolved = []
+    max_end = -1
+    for start, end, entity_type, _, _ in sorted(unique.values(), key=lambda s: (s[0], -s[1])):
+        if end <= max_end:
+            continue
+        max_end = end
+        # Spans of the same type separated only by spaces are joined
+        if resolved and resolved[-1][2] == entity_type and re.fullmatch(" +", text[resolved[-1][1]:start]):
+            start = resolved.pop()[0]
+        resolved.append((start, end, entity_type))
+    return resolved
+
+
+def redact(text: str, analyzer_results: list[RecognizerResult], operators: Optional[dict] = None) -> RedactedText:
+    """
+    Redacts analyzer results from text with the replace/mask/hash operators.
+
+    Args:
+        text: Text that was analyzed
+        analyzer_results: Results returned by `AnalyzerEngine.analyze` for the text
+        operators: Operator configuration keyed by entity type (see module docstring)
+
+    Returns:
+        RedactedText with the redacted text, whether anything changed and the redacted entity types
+    """
+    if not analyzer_results:
+        return RedactedText(text, False, [])
+
+    operators = validate_operators(operators)
+    parts = []
+    entity_types = []
+    transformed = False
+    cursor = 0
+    for start, end, entity_type in merge_spans(text, analyzer_results):
+        original = text[start:end]
+        replacement = _apply_operator(operators.get(entity_type, operators["DEFAULT"]), entity_type, original)
+        transformed = transformed or replacement != original
+        # Empty when the previous span overlaps this one; Presidio cuts it off here
+        parts.append(text[cursor:start])
+        parts.append(replacement)
+        entity_types.append(entity_type)
+        cursor = end
+    parts.append(text[cursor:])
+    return RedactedText("".join(parts), transformed, entity_types)
+
+
+def to_operator_configs(operators: Optional[dict]) -> dict[str, OperatorConfig]:
+    """Converts an operator configuration into Presidio `OperatorConfig` objects."""
+    return {
+        entity_type: OperatorConfig(
+            operator.get("type", "replace"),
+            {key: value for key, value in operator.items() if key != "type"},
+        )
+        for entity_type, operator in validate_operators(operators).items()
+    }
+
+
+def check_against_anonymizer(
+    text: str,
+    analyzer_results: list[RecognizerResult],
+    operators: Optional[dict] = None,
+    anonymizer: Optional[AnonymizerEngine] = None,
+) -> bool:
+    """
+    Compares `redact` with `AnonymizerEngine.anonymize` for the same input.
+
+    Returns:
+        True if both engines produce the same text; mismatches are logged
+    """
+    anonymizer = anonymizer or AnonymizerEngine()
+    # Hashes without a configured salt are salted randomly per entity, so both engines share one salt here
+    operators = {
+        entity_type: {"salt": os.urandom(32), **operator} if operator.get("type") == "hash" else operator
+        for entity_type, operator in validate_operators(operators).items()
+    }
+    expected = anonymizer.anonymize(
+        text=text,
+        analyzer_results=analyzer_results,
+        operators=to_operator_configs(operators),
+    ).text
+    actual = redact(text, analyzer_results, operators).text
+    if actual != expected:
+        logger.warning(
+            f"Fast redaction differs from AnonymizerEngine for entities "
+            f"{sorted({r.entity_type for r in analyzer_results})}"
+        )
+        return False
+    return True
@@ -0,0 +1,141 @@
+"""
+CPU topology-aware runtime configuration.
+
+torch, the tokenizers library and the BLAS libraries under spaCy each size
+their thread pools from the host's core count, which oversubscribes
+containers running with a CPU limit. `apply_runtime_config` reads the cgroup
+CPU quota and the process CPU affinity, derives the number of CPUs the process
+can actually use, and sizes everything from that:
+
+- OMP/MKL/OpenBLAS thread counts and tokenizer parallelism (environment
+  variables, so this must run before torch, tokenizers or spaCy are imported)
+- torch intra-/inter-op threads of the shared inference runtime
+- the number of threads serving the synchronous guardrail endpoints
+- optionally (CPU_PINNING=true), pinning the process to that many cores
+
+Explicit environment variables (TORCH_NUM_THREADS, OMP_NUM_THREADS, ...) always
+take precedence over the derived values.
+"""
+import logging
+import math
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+# Threads serving synchronous guardrail endpoints per usable CPU; most of their
+# time is spent waiting on the inference runtime rather than computing
+EXECUTOR_THREADS_PER_CPU = 4
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RuntimeConfig:
+    cpu_quota: Optional[float]
+    affinity_cpus: list[int]
+    effective_cpus: int
+    torch_intra_op_threads: int
+    torch_inter_op_threads: int
+    executor_threads: int
+    tokenizers_parallelism: bool
+    pinned_cpus: Optional[list[int]] = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def read_cgroup_cpu_quota(cgroup_root: str = "/sys/fs/cgroup") -> Optional[float]:
+    """Returns the CPU limit of the container in CPUs, or None if it is unlimited."""
+    root = Path(cgroup_root)
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        cpu_max = root / "cpu.max"
+        if cpu_max.is_file():
+            quota, period = cpu_max.read_text().split()[:2]
+            return None if quota == "max" else int(quota) / int(period)
+
+        # cgroup v1
+        quota_file = root / "cpu" / "cpu.cfs_quota_us"
+        period_file = root / "cpu" / "cpu.cfs_period_us"
+        if quota_file.is_file() and period_file.is_file():
+            quota = int(quota_file.read_text())
+            return None if quota <= 0 else quota / int(period_file.read_text())
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read cgroup CPU quota: {str(e)}")
+    return None
+
+
+def affinity_cpus() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def effective_cpu_count() -> int:
+    """Number of CPUs the process can use, given both its affinity and the cgroup quota."""
+    cpus = len(affinity_cpus())
+    quota = read_cgroup_cpu_quota()
+    if quota is not None:
+        # A fractional limit cannot run more threads than its whole CPUs without throttling
+        cpus = min(cpus, max(1, math.floor(quota)))
+    return cpus
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def build_runtime_config(cpu_budget: Optional[int] = None) -> RuntimeConfig:
+    """
+    Derives thread settings from the CPU topology.
+
+    Args:
+        cpu_budget: CPUs this process may use (default: every usable CPU); worker
+            pools pass their per-worker share
+    """
+    effective_cpus = cpu_budget or effective_cpu_count()
+    intra_op = _env_int("TORCH_NUM_THREADS") or effective_cpus
+    return RuntimeConfig(
+        cpu_quota=read_cgroup_cpu_quota(),
+        affinity_cpus=affinity_cpus(),
+        effective_cpus=effective_cpus,
+        torch_intra_op_threads=intra_op,
+        torch_inter_op_threads=_env_int("TORCH_NUM_INTEROP_THREADS") or 1,
+        executor_threads=_env_int("GUARDRAIL_EXECUTOR_THREADS") or max(4, EXECUTOR_THREADS_PER_CPU * effective_cpus),
+        tokenizers_parallelism=os.getenv("TOKENIZERS_PARALLELISM", "false").lower() == "true",
+    )
+
+
+def apply_runtime_config(cpu_budget: Optional[int] = None, pin_cpus: Optional[list[int]] = None) -> RuntimeConfig:
+    """
+    Applies the derived thread settings to this process.
+
+    Args:
+        cpu_budget: CPUs this process may use (default: every usable CPU)
+        pin_cpus: Cores to pin the process to, or an empty list to never pin; by default
+            the first `effective_cpus` allowed cores are used when CPU_PINNING=true
+
+    Returns:
+        The applied configuration
+    """
+    config = build_runtime_config(cpu_budget)
+
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(name, str(config.torch_intra_op_threads))
+    # Tokenization runs on the inference runtime thread; a parallel pool would compete with torch
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", str(config.tokenizers_parallelism).lower())
+
+    if pin_cpus is None and os.getenv("CPU_PINNING", "false").lower() == "true":
+        pin_cpus = config.affinity_cpus[:config.effective_cpus]
+    if pin_cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, pin_cpus)
+        config.pinned_cpus = list(pin_cpus)
+
+    from inference_runtime import runtime
+    runtime.configure_threads(intra_op=config.torch_intra_op_threads, inter_op=config.torch_inter_op_threads)
+
+    logger.info(f"Runtime configuration: {config.as_dict()}")
+    return config
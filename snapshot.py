@@ -0,0 +1,150 @@
+"""
+Warm-start snapshot of the models used by the guardrails.
+
+Cold start otherwise means downloading or reading the toxicity model from the
+Hugging Face cache. Running
+
+    python snapshot.py build
+
+during the Docker build serializes it into SNAPSHOT_DIR: model weights as
+safetensors (memory-mapped on load) and the tokenizer. The spaCy pipeline used
+by Presidio is not included, since it loads from its installed package just as
+fast as from a copy; the build fails if that package is not installed. At
+startup the guardrails resolve their model locations through `model_path`,
+which prefers the snapshot whenever it contains the component, and the time
+spent loading each component is recorded with `load_timer` so the server can
+report it.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+
+# Directory holding the snapshot; the Docker image builds it into /app/.snapshot
+SNAPSHOT_DIR = os.getenv("GUARDRAIL_SNAPSHOT_DIR", ".snapshot")
+MANIFEST_FILE = "manifest.json"
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Seconds spent loading each component during startup, keyed by component name
+LOAD_TIMES: dict[str, float] = {}
+
+
+@lru_cache(maxsize=None)
+def read_manifest(snapshot_dir: str = SNAPSHOT_DIR) -> dict:
+    """Returns the snapshot manifest, or an empty manifest if none has been built."""
+    manifest_path = Path(snapshot_dir) / MANIFEST_FILE
+    if not manifest_path.is_file():
+        return {"components": {}}
+    with manifest_path.open() as f:
+        return json.load(f)
+
+
+def model_path(component: str, default: str, snapshot_dir: str = SNAPSHOT_DIR) -> str:
+    """
+    Resolves where a component should be loaded from.
+
+    Args:
+        component: Component name inside the snapshot, e.g. "toxicity"
+        default: Model name or path to use when the snapshot does not contain the component
+
+    Returns:
+        Path of the component inside the snapshot if present, otherwise `default`
+    """
+    entry = read_manifest(snapshot_dir)["components"].get(component)
+    path = Path(snapshot_dir) / component
+    if entry is None or entry.get("source") != default or not path.is_dir():
+        return default
+    return str(path)
+
+
+@contextmanager
+def load_timer(component: str):
+    """Records the wall-clock time spent loading a component in LOAD_TIMES."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        LOAD_TIMES[component] = round(time.perf_counter() - start, 3)
+        logger.info(f"Loaded {component} in {LOAD_TIMES[component]:.3f}s")
+
+
+def _snapshot_toxicity_model(target: Path) -> str:
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+    from guardrail.nsfw_filtering_local_eval import MODEL_NAME
+
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
+    model.save_pretrained(target, safe_serialization=True)
+    tokenizer.save_pretrained(target)
+    return MODEL_NAME
+
+
+def _check_spacy_models() -> None:
+    import spacy
+    from presidio_entities import SPACY_MODELS
+
+    # SpacyNlpEngine downloads a missing pipeline on load, which would happen on every pod start
+    missing = [model_name for model_name in SPACY_MODELS.values() if not spacy.util.is_package(model_name)]
+    if missing:
+        raise RuntimeError(
+            f"spaCy pipelines not installed: {', '.join(missing)}. "
+            f"Install them with `python -m spacy download <name>` before building the snapshot"
+        )
+
+
+def build_snapshot(snapshot_dir: str = SNAPSHOT_DIR) -> dict:
+    """
+    Serializes the guardrail models into `snapshot_dir` and writes its manifest.
+
+    Args:
+        snapshot_dir: Directory to write the snapshot to
+
+    Returns:
+        The manifest that was written
+
+    Raises:
+        RuntimeError: If a spaCy pipeline used by Presidio is not installed
+    """
+    _check_spacy_models()
+
+    root = Path(snapshot_dir)
+    root.mkdir(parents=True, exist_ok=True)
+
+    builders = {"toxicity": _snapshot_toxicity_model}
+
+    components = {}
+    for component, builder in builders.items():
+        start = time.perf_counter()
+        target = root / component
+        target.mkdir(parents=True, exist_ok=True)
+        source = builder(target)
+        components[component] = {"source": source}
+        logger.info(f"Snapshotted {component} from {source} in {time.perf_counter() - start:.1f}s")
+
+    manifest = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "components": components,
+    }
+    with (root / MANIFEST_FILE).open("w") as f:
+        json.dump(manifest, f, indent=2)
+    read_manifest.cache_clear()
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the guardrail warm-start snapshot")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Serialize models into the snapshot directory")
+    build_parser.add_argument("--dir", default=SNAPSHOT_DIR, help="Snapshot directory")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    manifest = build_snapshot(args.dir)
+    print(json.dumps(manifest, indent=2))
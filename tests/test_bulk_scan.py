@@ -0,0 +1,92 @@
+import json
+import sys
+from types import ModuleType, SimpleNamespace
+
+import pytest
+
+import bulk_scan
+
+
+def _output_request(*contents):
+    return SimpleNamespace(responseBody={"choices": [{"message": {"content": content}} for content in contents]})
+
+
+@pytest.fixture
+def stub_nsfw_classifier(monkeypatch):
+    def classify_texts(texts, batch_size=8, priority=0):
+        if any(not isinstance(text, str) for text in texts):
+            raise TypeError("content must be a string")
+        return [[{"label": "toxicity", "score": 0.9 if "nsfw" in text else 0.01}] for text in texts]
+
+    module = ModuleType("guardrail.nsfw_filtering_local_eval")
+    module.classify_texts = classify_texts
+    module.is_nsfw = lambda results: any(result["score"] > 0.2 for result in results)
+    monkeypatch.setitem(sys.modules, "guardrail.nsfw_filtering_local_eval", module)
+
+
+def test_nsfw_batch_classifies_every_choice(stub_nsfw_classifier):
+    requests = [_output_request("hello"), _output_request("fine", "nsfw text"), _output_request()]
+
+    assert [result["status"] for result in bulk_scan._nsfw_batch(requests)] == ["passed", "blocked", "passed"]
+
+
+def test_nsfw_batch_failure_only_marks_the_bad_record(stub_nsfw_classifier):
+    requests = [_output_request("hello"), _output_request(None), _output_request("nsfw text")]
+
+    assert [result["status"] for result in bulk_scan._nsfw_batch(requests)] == ["passed", "error", "blocked"]
+
+
+def _write_input(path, count):
+    record = {"requestBody": {"messages": []}, "context": {"user": {}}}
+    path.write_text("".join(json.dumps(record) + "\n" for _ in range(count)))
+
+
+def _output_lines(path):
+    return [json.loads(line)["line"] for line in path.read_text().splitlines()]
+
+
+def test_fresh_run_discards_stale_checkpoint(tmp_path):
+    input_path, output_path = tmp_path / "input.jsonl", tmp_path / "output.jsonl"
+    _write_input(input_path, 0)
+    output_path.write_text("stale\n")
+    bulk_scan._write_checkpoint(f"{output_path}.checkpoint", 100, 6)
+
+    assert bulk_scan.run(str(input_path), str(output_path), [], workers=1) == 0
+    assert output_path.read_text() == ""
+    assert not (tmp_path / "output.jsonl.checkpoint").exists()
+
+
+def test_run_checkpoints_written_output(tmp_path):
+    input_path, output_path = tmp_path / "input.jsonl", tmp_path / "output.jsonl"
+    _write_input(input_path, 3)
+
+    assert bulk_scan.run(str(input_path), str(output_path), [], workers=1, batch_size=2) == 3
+    assert _output_lines(output_path) == [1, 2, 3]
+    assert bulk_scan._read_checkpoint(f"{output_path}.checkpoint") == {
+        "lines_done": 3,
+        "output_offset": output_path.stat().st_size,
+    }
+
+
+def test_resume_continues_after_checkpoint(tmp_path):
+    input_path, output_path = tmp_path / "input.jsonl", tmp_path / "output.jsonl"
+    _write_input(input_path, 5)
+    bulk_scan.run(str(input_path), str(output_path), [], workers=1, batch_size=2)
+    first_two = "".join(output_path.read_text().splitlines(keepends=True)[:2])
+    # Simulate a crash after the first batch, with a partially written line after it
+    output_path.write_text(first_two + '{"line": 3, "resu')
+    bulk_scan._write_checkpoint(f"{output_path}.checkpoint", 2, len(first_two))
+
+    assert bulk_scan.run(str(input_path), str(output_path), [], workers=1, batch_size=2, resume=True) == 3
+    assert _output_lines(output_path) == [1, 2, 3, 4, 5]
+
+
+def test_resume_rejects_checkpoint_beyond_output(tmp_path):
+    input_path, output_path = tmp_path / "input.jsonl", tmp_path / "output.jsonl"
+    _write_input(input_path, 2)
+    output_path.write_text("short\n")
+    bulk_scan._write_checkpoint(f"{output_path}.checkpoint", 1, 1000)
+
+    with pytest.raises(ValueError, match="rerun without --resume"):
+        bulk_scan.run(str(input_path), str(output_path), [], workers=1, resume=True)
+    assert output_path.read_text() == "short\n"
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from inference_runtime import InferenceRuntime, _Task
+
+
+@pytest.fixture
+def stub_runtime():
+    runtime = InferenceRuntime(max_batch_size=8, max_batch_wait_ms=50)
+    # Stub models do not need torch thread settings
+    runtime._threads_applied = True
+    return runtime
+
+
+def _infer_concurrently(runtime, name, inputs):
+    results = {}
+
+    def call(value):
+        try:
+            results[value] = runtime.infer(name, [value])
+        except Exception as e:
+            results[value] = e
+
+    threads = [threading.Thread(target=call, args=(value,)) for value in inputs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_batched_requests_get_their_own_outputs(stub_runtime):
+    batches = []
+
+    def upper(model, texts):
+        batches.append(list(texts))
+        return [text.upper() for text in texts]
+
+    stub_runtime.register("stub", lambda: None, upper)
+    results = _infer_concurrently(stub_runtime, "stub", ["a", "b", "c", "d"])
+
+    assert results == {"a": ["A"], "b": ["B"], "c": ["C"], "d": ["D"]}
+    assert sum(len(batch) for batch in batches) == 4
+
+
+def test_failing_input_only_fails_its_own_request(stub_runtime):
+    def upper(model, texts):
+        if "bad" in texts:
+            raise ValueError("bad input")
+        return [text.upper() for text in texts]
+
+    stub_runtime.register("stub", lambda: None, upper)
+    results = _infer_concurrently(stub_runtime, "stub", ["a", "bad", "c", "d"])
+
+    assert isinstance(results.pop("bad"), ValueError)
+    assert results == {"a": ["A"], "c": ["C"], "d": ["D"]}
+
+
+def _queue_task(runtime, name, value, priority=0):
+    task = _Task(model_name=name, inputs=[value], kwargs={})
+    runtime._queue.put((priority, next(runtime._sequence), task))
+    return task
+
+
+def test_next_batch_stops_at_other_work(stub_runtime):
+    first, other, later = (_queue_task(stub_runtime, name, value) for name, value in [("a", 1), ("b", 2), ("a", 3)])
+
+    assert stub_runtime._next_batch() == [first]
+    assert stub_runtime._next_batch() == [other]
+    assert stub_runtime._next_batch() == [later]
+
+
+def test_next_batch_wait_is_bounded(stub_runtime):
+    first = _queue_task(stub_runtime, "a", 1)
+    stop = threading.Event()
+
+    def feed():
+        # Same-model tasks arriving faster than the batch wait, which a per-get timeout never ends
+        while not stop.is_set():
+            _queue_task(stub_runtime, "a", 2)
+            time.sleep(0.01)
+
+    stub_runtime.max_batch_size = 1000
+    feeder = threading.Thread(target=feed)
+    feeder.start()
+    try:
+        start = time.monotonic()
+        batch = stub_runtime._next_batch()
+        elapsed = time.monotonic() - start
+    finally:
+        stop.set()
+        feeder.join()
+
+    assert batch[0] is first
+    assert elapsed < 0.5
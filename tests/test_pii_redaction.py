@@ -0,0 +1,17 @@
+import pytest
+
+pytest.importorskip("presidio_analyzer")
+
+from entities import InputGuardrailRequest
+from guardrail.pii_redaction_presidio import process_input_guardrail
+
+
+def test_rejects_unknown_redaction_engine():
+    request = InputGuardrailRequest(
+        requestBody={"messages": [{"role": "user", "content": "Call John at 555-123-4567"}]},
+        context={"user": {}, "metadata": {}},
+        config={"transform_input": True, "redaction_engine": "Presidio"},
+    )
+
+    with pytest.raises(ValueError, match="Unsupported redaction engine"):
+        process_input_guardrail(request)
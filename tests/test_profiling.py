@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("httpx")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import profiling
+
+TOKEN = "test-token"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_ADMIN_TOKEN", TOKEN)
+    monkeypatch.setattr(profiling, "_profiled_routes", set())
+    monkeypatch.setattr(profiling, "_active_session", None)
+
+    def echo(value: int) -> dict:
+        return {"value": value}
+
+    app = FastAPI()
+    app.add_api_route("/echo", endpoint=profiling.profiled("/echo", echo), methods=["GET"])
+    app.include_router(profiling.router)
+    return TestClient(app, headers={"X-Admin-Token": TOKEN})
+
+
+def test_requires_admin_token(client):
+    assert client.post("/admin/profiling/cpu", json={"route": "/echo"}, headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"route": "/echo", "sample_interval_ms": 0},
+        {"route": "/echo", "requests": 0},
+        {"route": "/echo", "seconds": -1},
+    ],
+)
+def test_rejects_invalid_session_config(client, config):
+    assert client.post("/admin/profiling/cpu", json=config).status_code == 422
+
+
+def test_rejects_routes_not_profiled(client):
+    response = client.post("/admin/profiling/cpu", json={"route": "/ech0"})
+
+    assert response.status_code == 400
+    assert "/echo" in response.json()["detail"]
+
+
+def test_profiles_requests_of_the_route(client):
+    session = client.post("/admin/profiling/cpu", json={"route": "/echo", "requests": 2}).json()
+
+    for value in range(3):
+        assert client.get("/echo", params={"value": value}).json() == {"value": value}
+
+    summary = client.get(f"/admin/profiling/cpu/{session['id']}").json()
+    assert summary["done"]
+    assert summary["requests_profiled"] == 2
+    assert client.get(f"/admin/profiling/cpu/{session['id']}/pstats").status_code == 200
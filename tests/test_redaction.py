@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+pytest.importorskip("presidio_anonymizer")
+
+from presidio_anonymizer import AnonymizerEngine
+from presidio_anonymizer.entities import RecognizerResult
+
+from redaction import check_against_anonymizer, redact, to_operator_configs, validate_operators
+
+TEXT = "Call John Smith at 555-123-4567 or mail john@example.com from Paris, France today"
+SALT = "0123456789abcdef"
+
+OPERATORS = {
+    "replace": None,
+    "replace_new_value": {"DEFAULT": {"type": "replace", "new_value": "[REDACTED]"}},
+    "mask": {"DEFAULT": {"type": "mask", "masking_char": "*", "chars_to_mask": 4, "from_end": True}},
+    "mask_from_start": {"DEFAULT": {"type": "mask", "masking_char": "#", "chars_to_mask": 100, "from_end": False}},
+    "hash": {"DEFAULT": {"type": "hash", "salt": SALT}},
+    "hash_sha512": {"DEFAULT": {"type": "hash", "hash_type": "sha512", "salt": SALT}},
+    "per_entity": {
+        "PERSON": {"type": "mask", "masking_char": "x", "chars_to_mask": 2, "from_end": False},
+        "PHONE_NUMBER": {"type": "hash", "salt": SALT},
+    },
+}
+
+SPANS = {
+    "disjoint": [("PERSON", 5, 15, 0.85), ("PHONE_NUMBER", 19, 31, 0.75), ("EMAIL_ADDRESS", 40, 56, 1.0)],
+    "identical_equal_scores": [("PERSON", 5, 15, 0.85), ("LOCATION", 5, 15, 0.85)],
+    "identical_different_scores": [("LOCATION", 5, 15, 0.9), ("PERSON", 5, 15, 0.5)],
+    "contained": [("PERSON", 5, 15, 0.5), ("LOCATION", 10, 15, 0.9)],
+    "same_start_contained": [("LOCATION", 5, 10, 0.9), ("PERSON", 5, 15, 0.5)],
+    "same_type_overlap": [("PERSON", 5, 12, 0.6), ("PERSON", 10, 15, 0.8)],
+    "same_type_touching": [("PERSON", 5, 10, 0.6), ("PERSON", 10, 15, 0.8)],
+    "same_type_spaces": [("PERSON", 5, 9, 0.6), ("PERSON", 10, 15, 0.8)],
+    "partial_overlap": [("PERSON", 5, 15, 0.8), ("PHONE_NUMBER", 12, 31, 0.7)],
+    "chained_overlap": [("PERSON", 5, 20, 0.8), ("PHONE_NUMBER", 12, 31, 0.7), ("URL", 18, 35, 0.6)],
+    "unsorted": [("EMAIL_ADDRESS", 40, 56, 1.0), ("LOCATION", 62, 67, 0.85), ("LOCATION", 69, 75, 0.85)],
+}
+
+
+def _results(spans):
+    return [RecognizerResult(entity_type, start, end, score) for entity_type, start, end, score in spans]
+
+
+def _anonymize(text, results, operators):
+    return AnonymizerEngine().anonymize(text, results, operators=to_operator_configs(operators)).text
+
+
+@pytest.mark.parametrize("operators", OPERATORS.values(), ids=OPERATORS.keys())
+@pytest.mark.parametrize("spans", SPANS.values(), ids=SPANS.keys())
+def test_redact_matches_anonymizer(spans, operators):
+    assert redact(TEXT, _results(spans), operators).text == _anonymize(TEXT, _results(spans), operators)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_redact_matches_anonymizer_on_random_spans(seed):
+    rng = random.Random(seed)
+    spans = []
+    for _ in range(rng.randint(1, 8)):
+        start = rng.randrange(len(TEXT) - 1)
+        end = rng.randint(start + 1, min(len(TEXT), start + 15))
+        spans.append((rng.choice(["PERSON", "LOCATION", "PHONE_NUMBER"]), start, end, rng.choice([0.4, 0.6, 0.85])))
+    operators = rng.choice(list(OPERATORS.values()))
+
+    assert redact(TEXT, _results(spans), operators).text == _anonymize(TEXT, _results(spans), operators)
+
+
+def test_hash_without_salt_is_salted_per_entity():
+    results = _results([("PERSON", 5, 9, 0.8), ("PERSON", 11, 15, 0.8)])
+    text = "Call John, John today"
+    operators = {"DEFAULT": {"type": "hash"}}
+
+    first = redact(text, results, operators).text
+    assert first != redact(text, results, operators).text
+    assert first.split()[1].rstrip(",") != first.split()[2]
+
+
+def test_check_against_anonymizer_with_random_salts():
+    results = _results(SPANS["disjoint"])
+
+    assert check_against_anonymizer(TEXT, results, {"DEFAULT": {"type": "hash"}}, AnonymizerEngine())
+
+
+@pytest.mark.parametrize(
+    "operator",
+    [
+        {"type": "redact"},
+        {"type": "replace", "new_value": 1},
+        {"type": "mask", "masking_char": "*", "chars_to_mask": 4},
+        {"type": "mask", "masking_char": "**", "chars_to_mask": 4, "from_end": True},
+        {"type": "mask", "masking_char": "*", "chars_to_mask": "4", "from_end": True},
+        {"type": "mask", "masking_char": "*", "chars_to_mask": 4, "from_end": "yes"},
+        {"type": "hash", "hash_type": "md5"},
+        {"type": "hash", "salt": ""},
+        {"type": "hash", "salt": "too-short"},
+    ],
+)
+def test_invalid_operators_are_rejected(operator):
+    with pytest.raises(ValueError):
+        validate_operators({"PERSON": operator})
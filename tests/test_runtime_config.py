@@ -0,0 +1,65 @@
+import pytest
+
+import runtime_config
+
+
+@pytest.mark.parametrize(
+    "files, expected",
+    [
+        ({"cpu.max": "200000 100000\n"}, 2.0),
+        ({"cpu.max": "150000 100000\n"}, 1.5),
+        ({"cpu.max": "max 100000\n"}, None),
+        ({"cpu/cpu.cfs_quota_us": "50000\n", "cpu/cpu.cfs_period_us": "100000\n"}, 0.5),
+        ({"cpu/cpu.cfs_quota_us": "-1\n", "cpu/cpu.cfs_period_us": "100000\n"}, None),
+        ({"cpu.max": "garbage\n"}, None),
+        ({}, None),
+    ],
+)
+def test_read_cgroup_cpu_quota(tmp_path, files, expected):
+    for name, content in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    assert runtime_config.read_cgroup_cpu_quota(str(tmp_path)) == expected
+
+
+@pytest.mark.parametrize("quota, expected", [(None, 4), (2.5, 2), (0.5, 1), (16.0, 4)])
+def test_effective_cpu_count(monkeypatch, quota, expected):
+    monkeypatch.setattr(runtime_config, "affinity_cpus", lambda: [0, 1, 2, 3])
+    monkeypatch.setattr(runtime_config, "read_cgroup_cpu_quota", lambda: quota)
+
+    assert runtime_config.effective_cpu_count() == expected
+
+
+@pytest.fixture
+def pinning(monkeypatch):
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "TOKENIZERS_PARALLELISM"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("CPU_PINNING", "true")
+    monkeypatch.setattr(runtime_config, "affinity_cpus", lambda: [0, 1, 2, 3])
+    monkeypatch.setattr(runtime_config, "read_cgroup_cpu_quota", lambda: 2.0)
+    calls = []
+    monkeypatch.setattr(runtime_config.os, "sched_setaffinity", lambda pid, cpus: calls.append(list(cpus)), raising=False)
+    return calls
+
+
+def test_cpu_pinning_env_pins_to_usable_cpus(pinning):
+    config = runtime_config.apply_runtime_config()
+
+    assert pinning == [[0, 1]]
+    assert config.pinned_cpus == [0, 1]
+
+
+def test_empty_pin_cpus_never_pins(pinning):
+    config = runtime_config.apply_runtime_config(cpu_budget=1, pin_cpus=[])
+
+    assert pinning == []
+    assert config.pinned_cpus is None
+
+
+def test_explicit_pin_cpus(pinning):
+    config = runtime_config.apply_runtime_config(cpu_budget=1, pin_cpus=[3])
+
+    assert pinning == [[3]]
+    assert config.pinned_cpus == [3]
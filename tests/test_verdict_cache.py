@@ -0,0 +1,72 @@
+from verdict_cache import VerdictCache, cache_stats
+
+
+def _upper_counting(calls):
+    def compute(texts):
+        calls.append(list(texts))
+        return [text.upper() for text in texts]
+    return compute
+
+
+def test_repeats_are_computed_once_and_counted_as_hits():
+    cache = VerdictCache("test-repeats", similarity=None)
+    calls = []
+
+    assert cache.get_or_compute(["a", "a", "b", "a"], _upper_counting(calls)) == ["A", "A", "B", "A"]
+    assert cache.get_or_compute(["b"], _upper_counting(calls)) == ["B"]
+
+    assert calls == [["a", "b"]]
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["misses"]) == (3, 2)
+    assert stats["hit_rate"] == 0.6
+    assert cache_stats()["test-repeats"] == stats
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = VerdictCache("test-eviction", max_entries=2, similarity=None)
+    calls = []
+    compute = _upper_counting(calls)
+
+    cache.get_or_compute(["a", "b"], compute)
+    cache.get_or_compute(["a"], compute)  # "b" is now the least recently used
+    cache.get_or_compute(["c"], compute)
+    cache.get_or_compute(["a", "b"], compute)
+
+    assert calls == [["a", "b"], ["c"], ["b"]]
+    assert cache.stats()["evictions"] == 2
+
+
+def test_near_duplicates_reuse_cached_values():
+    cache = VerdictCache("test-near-duplicates", similarity=0.8)
+    calls = []
+    text = "I'm sorry, but I can't help with that request. Please ask something else."
+
+    cache.get_or_compute([text], _upper_counting(calls))
+    assert cache.get_or_compute([text.replace("else.", "else!")], _upper_counting(calls)) == [text.upper()]
+    assert cache.get_or_compute(["Something entirely different"], _upper_counting(calls)) == ["SOMETHING ENTIRELY DIFFERENT"]
+
+    assert len(calls) == 2
+    assert cache.stats()["near_duplicate_hits"] == 1
+
+
+def test_exact_only_cache_does_not_reuse_near_duplicates():
+    cache = VerdictCache("test-exact-only", similarity=None)
+    calls = []
+    text = "Take 200mg of ibuprofen every six hours with food."
+
+    cache.get_or_compute([text], _upper_counting(calls))
+    cache.get_or_compute([text.replace("ibuprofen", "oxycodone")], _upper_counting(calls))
+
+    assert len(calls) == 2
+
+
+def test_eviction_removes_lsh_buckets():
+    cache = VerdictCache("test-buckets", max_entries=1, similarity=0.9)
+    compute = _upper_counting([])
+
+    cache.get_or_compute(["the first cached response text"], compute)
+    cache.get_or_compute(["a second, unrelated response"], compute)
+
+    assert len(cache._entries) == 1
+    indexed = set().union(*cache._buckets.values())
+    assert indexed == set(cache._entries)
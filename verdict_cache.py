@@ -0,0 +1,178 @@
+"""
+Verdict cache for output guardrails.
+
+LLM outputs repeat a lot (templated refusals, canned answers, near-identical
+`n>1` choices), so output guardrails cache what they computed for a text and
+reuse it for repeats instead of running the model again:
+
+- exact lookups by a hash of the text (the text itself is not stored)
+- optionally, near-duplicate lookups through a MinHash/LSH index: a text whose
+  estimated Jaccard similarity (character 5-gram shingles) with a cached text
+  is at least VERDICT_CACHE_SIMILARITY reuses that entry
+
+Near-duplicate reuse can be turned off per guardrail with `similarity=None`,
+for guardrails whose verdict can hinge on a small edit. Guardrails cache raw
+results (e.g. per-label scores) rather than final decisions, so their
+thresholds are still applied to cached values. Entries are
+evicted least-recently-used beyond VERDICT_CACHE_SIZE, and hit/miss counters
+for every cache are available from `cache_stats()`.
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "10000"))
+# Minimum estimated similarity for near-duplicate reuse; unset means exact matches only
+VERDICT_CACHE_SIMILARITY = float(os.environ["VERDICT_CACHE_SIMILARITY"]) if os.getenv("VERDICT_CACHE_SIMILARITY") else None
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+SHINGLE_SIZE = 5
+# Candidates from the LSH index that are compared against a text's signature
+MAX_CANDIDATES = 32
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(1)
+_PERMUTATION_A = _rng.randint(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERMUTATION_B = _rng.randint(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+_MISSING = object()
+_caches: dict[str, "VerdictCache"] = {}
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """Returns the MinHash signature of the character shingles of a normalized text."""
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(max(1, len(text) - SHINGLE_SIZE + 1))}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    permuted = ((hashes[:, None] * _PERMUTATION_A + _PERMUTATION_B) % _MERSENNE_PRIME) & _MAX_HASH
+    return permuted.min(axis=0)
+
+
+class VerdictCache:
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = VERDICT_CACHE_SIZE,
+        similarity: Optional[float] = VERDICT_CACHE_SIMILARITY,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._entries: OrderedDict[bytes, tuple[Any, Optional[np.ndarray]]] = OrderedDict()
+        self._buckets: dict[tuple[int, bytes], set[bytes]] = {}
+        self._lock = threading.Lock()
+        self._counters = {"exact_hits": 0, "near_duplicate_hits": 0, "misses": 0, "evictions": 0}
+        _caches[name] = self
+
+    def _band_keys(self, signature: np.ndarray) -> list[tuple[int, bytes]]:
+        rows = NUM_PERMUTATIONS // LSH_BANDS
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+
+    def _lookup(self, key: bytes, signature: Optional[np.ndarray]) -> Any:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self._counters["exact_hits"] += 1
+            return self._entries[key][0]
+        if signature is not None:
+            candidates = set()
+            for band_key in self._band_keys(signature):
+                candidates.update(self._buckets.get(band_key, ()))
+                if len(candidates) >= MAX_CANDIDATES:
+                    break
+            best_key, best_similarity = None, self.similarity
+            for candidate in candidates:
+                similarity = float(np.mean(self._entries[candidate][1] == signature))
+                if similarity >= best_similarity:
+                    best_key, best_similarity = candidate, similarity
+            if best_key is not None:
+                self._entries.move_to_end(best_key)
+                self._counters["near_duplicate_hits"] += 1
+                return self._entries[best_key][0]
+        self._counters["misses"] += 1
+        return _MISSING
+
+    def _store(self, key: bytes, value: Any, signature: Optional[np.ndarray]) -> None:
+        if key in self._entries:
+            return
+        self._entries[key] = (value, signature)
+        if signature is not None:
+            for band_key in self._band_keys(signature):
+                self._buckets.setdefault(band_key, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, (_, evicted_signature) = self._entries.popitem(last=False)
+            if evicted_signature is not None:
+                for band_key in self._band_keys(evicted_signature):
+                    bucket = self._buckets.get(band_key)
+                    if bucket is not None:
+                        bucket.discard(evicted_key)
+                        if not bucket:
+                            del self._buckets[band_key]
+            self._counters["evictions"] += 1
+
+    def get_or_compute(self, texts: list[str], compute: Callable[[list[str]], list]) -> list:
+        """
+        Returns the cached value for each text, computing the misses in one call.
+
+        Args:
+            texts: Texts to look up
+            compute: Called with the texts that missed the cache; returns one value per text
+
+        Returns:
+            One value per input text
+        """
+        keys = [hashlib.blake2b(text.encode(), digest_size=16).digest() for text in texts]
+        signatures = [
+            minhash_signature(_normalize(text)) if self.similarity is not None and key not in self._entries else None
+            for text, key in zip(texts, keys)
+        ]
+        values = [_MISSING] * len(texts)
+        misses = OrderedDict()
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in misses:
+                    # Identical texts in one call (e.g. n>1 choices) are computed once and count as hits
+                    misses[key].append(i)
+                    self._counters["exact_hits"] += 1
+                    continue
+                values[i] = self._lookup(key, signatures[i])
+                if values[i] is _MISSING:
+                    misses[key] = [i]
+        if misses:
+            computed = compute([texts[indices[0]] for indices in misses.values()])
+            with self._lock:
+                for indices, value in zip(misses.values(), computed):
+                    self._store(keys[indices[0]], value, signatures[indices[0]])
+                    for i in indices:
+                        values[i] = value
+        return values
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["exact_hits"] + self._counters["near_duplicate_hits"] + self._counters["misses"]
+            hits = lookups - self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "similarity": self.similarity,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def cache_stats() -> dict[str, dict]:
+    """Returns hit-rate metrics for every verdict cache in the process."""
+    return {name: cache.stats() for name, cache in _caches.items()}